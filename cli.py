@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Command line export/import of search engines across browser profiles.
+
+Runs without the GUI, e.g. from a scheduled task. Databases and backups
+that are unchanged since the last run are skipped.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import locations
+import utils
+
+
+def profile_name(browser, web_data):
+    """Name a profile after its browser and directory, e.g. chrome-Default."""
+    profile = os.path.basename(os.path.dirname(web_data))
+    return f"{browser}-{profile}".replace(" ", "_")
+
+
+def get_sources(browsers, paths):
+    """Return (name, browser, Web Data path) of every selected database."""
+    if "all" in browsers:
+        browsers = list(locations.LOCATIONS.keys())
+    sources = []
+    for browser in browsers:
+        for web_data in locations.get_web_data_paths(browser):
+            name = profile_name(browser, web_data)
+            sources.append((name, browser, web_data))
+    for path in paths:
+        parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        name = f"{parent}-{os.path.basename(path)}".replace(" ", "_")
+        sources.append((name, None, path))
+    return sources
+
+
+def run_export(args, cache):
+    sources = get_sources(args.browser, args.databases)
+    if not sources:
+        print("No Web Data databases found.")
+        return 1
+
+    status = 0
+    for name, browser, web_data in sources:
+        if len(sources) == 1:
+            output = os.path.join(args.output_dir, utils.BACKUP_FILE)
+        else:
+            output = os.path.join(args.output_dir, f"engines-{name}.json")
+        try:
+            exported = utils.export_if_changed(
+                web_data,
+                output,
+                cache,
+                args.force,
+                args.resume,
+                browser,
+                args.workers,
+            )
+        except sqlite3.Error as e:
+            print(f"Error exporting {web_data}: {e}")
+            status = 1
+            continue
+        if not exported:
+            print(f"Unchanged, skipped {web_data}")
+    return status
+
+
+def run_import(args, cache):
+    sources = get_sources(args.browser, args.databases)
+    if not sources:
+        print("No Web Data databases found.")
+        return 1
+
+    mode = "replace" if args.replace else "ignore"
+    targets = [web_data for _name, _browser, web_data in sources]
+    failed = utils.import_targets(
+        targets, args.backup, mode, cache, args.force, args.resume
+    )
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--cache",
+        default=utils.FINGERPRINT_FILE,
+        help="fingerprint cache file (default: %(default)s)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="export to JSON backups")
+    export.add_argument(
+        "-o",
+        "--output-dir",
+        default=".",
+        help="directory for the backups (default: %(default)s)",
+    )
+    export.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="processes for validating large exports, 0 for one per CPU "
+        "(default: %(default)s)",
+    )
+
+    imp = commands.add_parser("import", help="import a JSON backup")
+    imp.add_argument(
+        "-f",
+        "--backup",
+        default=utils.BACKUP_FILE,
+        help="backup to import (default: %(default)s)",
+    )
+    imp.add_argument(
+        "--replace",
+        action="store_true",
+        help="replace existing engines with the same shortcut",
+    )
+
+    for command in (export, imp):
+        command.add_argument(
+            "-b",
+            "--browser",
+            action="append",
+            default=[],
+            choices=[*locations.LOCATIONS.keys(), "all"],
+            help="every profile of a browser, repeatable",
+        )
+        command.add_argument(
+            "--force",
+            action="store_true",
+            help="read and write even if nothing changed",
+        )
+        command.add_argument(
+            "--resume",
+            action="store_true",
+            help="continue an interrupted run from its checkpoint",
+        )
+        command.add_argument(
+            "databases", nargs="*", help="Web Data database files"
+        )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+
+    cache = utils.fingerprint_load(args.cache)
+    if args.command == "export":
+        status = run_export(args, cache)
+    else:
+        status = run_import(args, cache)
+    utils.fingerprint_save(cache, args.cache)
+
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Done in {elapsed:.1f} ms")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
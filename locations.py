@@ -1,3 +1,4 @@
+import glob
 import os
 import platform
 
@@ -45,3 +46,18 @@ def get_browser_path(browser: str) -> str | None:
     browser = browser.lower()
     if browser in LOCATIONS and system in LOCATIONS[browser]:
         return os.path.expandvars(LOCATIONS[browser][system])
+
+
+def get_web_data_paths(browser: str) -> list[str]:
+    """Return the `Web Data` files of every profile of `browser`."""
+    base = get_browser_path(browser)
+    if not base or not os.path.isdir(base):
+        return []
+    # Some locations point at the Default profile; the others are siblings
+    base = os.path.normpath(base)
+    if os.path.basename(base) == "Default":
+        base = os.path.dirname(base)
+    web_data = os.path.join(base, "Web Data")
+    if os.path.isfile(web_data):
+        return [web_data]
+    return sorted(glob.glob(os.path.join(glob.escape(base), "*", "Web Data")))
@@ -13,11 +13,17 @@ from PySide6.QtWidgets import (
     QPushButton,
     QFileDialog,
     QMessageBox,
+    QDialog,
+    QDialogButtonBox,
+    QLineEdit,
+    QListWidget,
+    QListWidgetItem,
 )
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont, QPalette, QColor, QColorConstants, QIcon
 
 import locations
+import search_index
 import utils
 
 
@@ -48,8 +54,8 @@ def show_success_import(path):
 def handle_conflicts_dialogs(conflicts):
     """Show dialogs for each conflict and return rows to replace."""
     to_replace = []
-    for key, old_row, new_row in conflicts:
-        diff = utils.compare_rows(old_row, new_row)
+    diffs = utils.compare_conflicts(conflicts)
+    for (key, old_row, new_row), diff in zip(conflicts, diffs):
         name = new_row[1] if new_row[1] else "Unknown"
         url = new_row[4]
         shortcut = new_row[2] if new_row[2] else ""
@@ -73,6 +79,102 @@ def handle_conflicts_dialogs(conflicts):
     return to_replace
 
 
+def pick_rows(rows, title):
+    """Show a searchable list of `rows` and return the checked ones.
+
+    Returns None if the dialog is cancelled.
+    """
+    index = search_index.EngineIndex(rows)
+
+    dialog = QDialog(win)
+    dialog.setWindowTitle(title)
+    dialog.setMinimumSize(500, 400)
+    layout = QVBoxLayout(dialog)
+
+    search = QLineEdit()
+    search.setPlaceholderText("Filter by name, shortcut or host")
+    search.setClearButtonEnabled(True)
+    layout.addWidget(search)
+
+    engines = QListWidget()
+    for row in index.rows:
+        name = row[1] if row[1] else "Unknown"
+        shortcut = row[2] if row[2] else ""
+        host = search_index.url_host(row[4])
+        item = QListWidgetItem(f"{name}  [{shortcut}]  {host}")
+        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+        item.setCheckState(Qt.CheckState.Checked)
+        engines.addItem(item)
+    layout.addWidget(engines)
+
+    label_count = QLabel()
+    layout.addWidget(label_count)
+
+    visible = set(range(len(index)))
+    checked = set(range(len(index)))
+
+    def update_count():
+        label_count.setText(
+            f"Showing {len(visible)} of {len(index)}, {len(checked)} checked"
+        )
+
+    def update_checked(item):
+        i = engines.row(item)
+        if item.checkState() == Qt.CheckState.Checked:
+            checked.add(i)
+        else:
+            checked.discard(i)
+        # Nothing to export or import with no engine checked
+        btn_ok.setEnabled(bool(checked))
+        update_count()
+
+    def apply_filter(text):
+        # Only toggle the items whose visibility changed
+        matches = set(index.search(text))
+        for i in visible - matches:
+            engines.item(i).setHidden(True)
+        for i in matches - visible:
+            engines.item(i).setHidden(False)
+        visible.clear()
+        visible.update(matches)
+        update_count()
+
+    def set_visible_checked(state):
+        for i in visible:
+            engines.item(i).setCheckState(state)
+
+    search.textChanged.connect(apply_filter)
+    engines.itemChanged.connect(update_checked)
+    update_count()
+
+    check_layout = QHBoxLayout()
+    btn_check = QPushButton("Check Shown")
+    btn_check.clicked.connect(
+        lambda: set_visible_checked(Qt.CheckState.Checked)
+    )
+    check_layout.addWidget(btn_check)
+    btn_uncheck = QPushButton("Uncheck Shown")
+    btn_uncheck.clicked.connect(
+        lambda: set_visible_checked(Qt.CheckState.Unchecked)
+    )
+    check_layout.addWidget(btn_uncheck)
+    layout.addLayout(check_layout)
+
+    buttons = QDialogButtonBox(
+        QDialogButtonBox.StandardButton.Ok
+        | QDialogButtonBox.StandardButton.Cancel
+    )
+    btn_ok = buttons.button(QDialogButtonBox.StandardButton.Ok)
+    buttons.accepted.connect(dialog.accept)
+    buttons.rejected.connect(dialog.reject)
+    layout.addWidget(buttons)
+
+    if dialog.exec() != QDialog.DialogCode.Accepted:
+        return None
+
+    return [index.rows[i] for i in sorted(checked)]
+
+
 def import_into_browser():
     """Import the JSON backup into the selected browser."""
     base_path = locations.get_browser_path(bw_sel.currentText().strip()) or ""
@@ -94,11 +196,16 @@ def import_into_browser():
         return
 
     print(f"Importing from {file_path}")
-    filas = utils.json_read(utils.BACKUP_FILE)
+    columns = [name for name, _type in utils.db_read_columns(file_path)]
+    filas = utils.json_read(utils.BACKUP_FILE, columns)
     if len(filas) == 0:
         show_empty_alert()
         return
 
+    filas = pick_rows(filas, "Select Search Engines to import")
+    if not filas:
+        return
+
     to_insert, conflicts = utils.handle_import_conflicts(file_path, filas)
 
     to_replace = handle_conflicts_dialogs(conflicts)
@@ -134,7 +241,12 @@ def export_from_browser(bw_sel):
         return
 
     filas = utils.db_read_keywords(file_path)
-    utils.json_write(filas)
+    filas = pick_rows(filas, "Select Search Engines to export")
+    if not filas:
+        return
+
+    browser = bw_sel.currentText().strip().lower()
+    utils.json_write(filas, header=utils.db_backup_header(file_path, browser))
     show_success_export()
 
 
@@ -0,0 +1,82 @@
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+# Separates the indexed fields of a row so trigrams never span two fields
+FIELD_SEP = "\n"
+TRIGRAM_LEN = 3
+
+
+def url_host(url):
+    """Return the lowercase host of `url`, or an empty string."""
+    if not url:
+        return ""
+    try:
+        return urlsplit(str(url)).hostname or ""
+    except ValueError:
+        return ""
+
+
+def row_search_text(row):
+    """Build the searchable text of a keyword row.
+
+    Indexed fields: short_name (idx 1), keyword (idx 2) and URL host (idx 4).
+    """
+    fields = (row[1], row[2], url_host(row[4]))
+    return FIELD_SEP.join(str(f).lower() for f in fields if f)
+
+
+class EngineIndex:
+    """N-gram index over the keyword rows of one database.
+
+    Built once per loaded database; `search` only touches the posting sets
+    of the query, so it can run on every keystroke.
+    """
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self._texts = []
+        # Every substring of 1 to 3 characters within a field
+        self._grams = defaultdict(set)
+
+        for i, row in enumerate(self.rows):
+            text = row_search_text(row)
+            self._texts.append(text)
+            for n in range(1, TRIGRAM_LEN + 1):
+                for j in range(len(text) - n + 1):
+                    gram = text[j : j + n]
+                    if FIELD_SEP not in gram:
+                        self._grams[gram].add(i)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _lookup(self, word):
+        """Return the set of row positions containing a single query word."""
+        if len(word) <= TRIGRAM_LEN:
+            return self._grams.get(word, set())
+
+        grams = {
+            word[j : j + TRIGRAM_LEN]
+            for j in range(len(word) - TRIGRAM_LEN + 1)
+        }
+        postings = sorted((self._grams.get(g, set()) for g in grams), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        # Trigrams may match out of order; confirm on the candidates only
+        return {i for i in candidates if word in self._texts[i]}
+
+    def search(self, query):
+        """Return the positions of rows matching every word in `query`.
+
+        Positions are sorted, so they follow the original row order.
+        """
+        words = query.lower().split()
+        if not words:
+            return list(range(len(self.rows)))
+
+        result = None
+        for word in sorted(words, key=len, reverse=True):
+            matches = self._lookup(word)
+            result = set(matches) if result is None else result & matches
+            if not result:
+                return []
+        return sorted(result)
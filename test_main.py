@@ -1,3 +1,4 @@
+import json
 import os
 import sqlite3
 import tempfile
@@ -124,3 +125,318 @@ def test_compare_rows():
             assert result is not None
             assert len(result) == 27
             assert result[1] == 'Bing'
+
+
+def test_engine_index_search():
+    import search_index
+
+    rows = [
+        (1, 'Google', 'g', '', 'https://www.google.com/search?q={searchTerms}'),
+        (2, 'DuckDuckGo', 'ddg', '', 'https://duckduckgo.com/?q={searchTerms}'),
+        (3, 'Wikipedia', 'wiki', '', 'https://en.wikipedia.org/w/index.php?search={searchTerms}'),
+        (4, 'Google Images', 'gi', '', 'https://images.google.com/search?q={searchTerms}'),
+    ]
+    index = search_index.EngineIndex(rows)
+
+    assert index.search("") == [0, 1, 2, 3]
+    assert index.search("w") == [0, 2]
+    assert index.search("ki") == [2]
+    assert index.search("dd") == [1]
+    assert index.search("a.") == [2]
+    assert index.search("e.") == [0, 3]
+    assert index.search("GOOG") == [0, 3]
+    assert index.search("google images") == [3]
+    assert index.search("wikipedia.org") == [2]
+    assert index.search("duck.com") == []
+    assert index.search("search") == []
+
+
+def test_compare_rows_url_components():
+    old_row = (1, 'Google', 'g', '', 'https://google.com/search?q={searchTerms}&hl=en&ie=utf8', 1, '', 0, 0, 'UTF-8', '')
+    new_row = (1, 'Google', 'g', '', 'https://google.com/search?q={searchTerms}&hl=es&oe=utf8', 1, '', 0, 0, 'UTF-8', '')
+
+    diff = utils.compare_rows(old_row, new_row, text=True)
+    assert "- https://google.com/search?q={searchTerms}&hl=e[-n-]&[-ie=utf8-]" in diff
+    assert "+ https://google.com/search?q={searchTerms}&hl=e{+s+}&{+oe=utf8+}" in diff
+    assert utils.compare_rows(old_row, old_row) == "No key changes"
+
+    # Names are not split like URLs
+    old_pieces, new_pieces = utils.diff_values("What? Now", "What? Later")
+    assert old_pieces == (("What? ", False), ("Now", True))
+    assert new_pieces == (("What? ", False), ("Later", True))
+
+    diffs = utils.compare_conflicts([("g", old_row, new_row)] * 2)
+    assert len(diffs) == 2
+    assert diffs[0] == diffs[1]
+    assert "<b>URL:</b>" in diffs[0]
+
+
+KEYWORDS_SCHEMA = """
+    CREATE TABLE keywords (
+        id INTEGER PRIMARY KEY, short_name VARCHAR, keyword VARCHAR, favicon_url VARCHAR,
+        url VARCHAR, safe_for_autoreplace INTEGER, originating_url VARCHAR,
+        date_created INTEGER, usage_count INTEGER, input_encodings VARCHAR,
+        suggest_url VARCHAR, prepopulate_id INTEGER, created_by_policy INTEGER,
+        last_modified INTEGER, sync_guid VARCHAR, alternate_urls VARCHAR,
+        image_url VARCHAR, search_url_post_params VARCHAR,
+        suggest_url_post_params VARCHAR, image_url_post_params VARCHAR,
+        new_tab_url VARCHAR, last_visited INTEGER, created_from_play_api INTEGER,
+        is_active INTEGER, starter_pack_id INTEGER, enforced_by_policy INTEGER,
+        featured_by_policy INTEGER, url_hash BLOB
+    )
+"""
+
+
+def make_keyword_row(i):
+    return (i, f'Engine {i}', f'e{i}', '', f'https://e{i}.example/?q={{searchTerms}}',
+            1, '', 0, 0, 'UTF-8', '', 0, 0, 0, f'guid-{i}', '[]', '', '', '', '', '',
+            0, 0, 1, 0, 0, 0, b'hash')
+
+
+def make_keywords_db(path, count):
+    with sqlite3.connect(path) as conn:
+        conn.execute(KEYWORDS_SCHEMA)
+    utils.db_insert_rows(path, [make_keyword_row(i) for i in range(1, count + 1)])
+
+
+def test_export_skips_unchanged_database():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = os.path.join(tmpdir, "Web Data")
+        backup = os.path.join(tmpdir, "engines.json")
+        make_keywords_db(db, 3)
+        cache = {}
+
+        assert utils.export_if_changed(db, backup, cache)
+        assert not utils.export_if_changed(db, backup, cache)
+
+        # Touching other tables changes the file but not the checksum
+        with sqlite3.connect(db) as conn:
+            conn.execute("CREATE TABLE meta (key VARCHAR, value VARCHAR)")
+        assert not utils.export_if_changed(db, backup, cache)
+
+        with sqlite3.connect(db) as conn:
+            conn.execute("UPDATE keywords SET url = 'https://x/?q={searchTerms}' WHERE id = 1")
+        assert utils.export_if_changed(db, backup, cache)
+
+        # Same-length edit that keeps last_modified
+        with sqlite3.connect(db) as conn:
+            conn.execute("UPDATE keywords SET keyword = 'zz', url = 'https://e9.example/?q={searchTerms}' WHERE id = 2")
+        assert utils.export_if_changed(db, backup, cache)
+        assert utils.json_read(backup, ["keyword"])[1] == ["zz"]
+
+        os.remove(backup)
+        assert utils.export_if_changed(db, backup, cache)
+        assert len(utils.json_read(backup)) == 3
+
+
+def test_export_sees_writes_during_export(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = os.path.join(tmpdir, "Web Data")
+        backup = os.path.join(tmpdir, "engines.json")
+        make_keywords_db(db, 3)
+        cache = {}
+
+        export_checkpointed = utils.export_checkpointed
+
+        def export_then_write(*args, **kwargs):
+            checksum = export_checkpointed(*args, **kwargs)
+            # The browser writes before the fingerprint is stored
+            with sqlite3.connect(db) as conn:
+                conn.execute("UPDATE keywords SET keyword = 'zz' WHERE id = 1")
+            return checksum
+
+        monkeypatch.setattr(utils, "export_checkpointed", export_then_write)
+        assert utils.export_if_changed(db, backup, cache)
+
+        monkeypatch.setattr(utils, "export_checkpointed", export_checkpointed)
+        assert utils.export_if_changed(db, backup, cache)
+        assert utils.json_read(backup, ["keyword"])[0] == ["zz"]
+
+
+def interrupt_export(monkeypatch, db, backup, after):
+    """Kill an export in chunks of 2 while encoding row `after` + 1.
+
+    Returns the list that records the rows encoded from then on.
+    """
+    encode_row = utils.encode_row
+    calls = []
+
+    def failing_encode_row(row):
+        if len(calls) == after:
+            raise KeyboardInterrupt
+        calls.append(row)
+        return encode_row(row)
+
+    monkeypatch.setattr(utils, "encode_row", failing_encode_row)
+    try:
+        utils.export_checkpointed(db, backup, chunk_size=2)
+    except KeyboardInterrupt:
+        pass
+
+    calls.clear()
+    monkeypatch.setattr(
+        utils, "encode_row", lambda row: calls.append(row) or encode_row(row)
+    )
+    return calls
+
+
+def test_export_resumes_from_checkpoint(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = os.path.join(tmpdir, "Web Data")
+        backup = os.path.join(tmpdir, "engines.json")
+        make_keywords_db(db, 7)
+
+        calls = interrupt_export(monkeypatch, db, backup, 4)
+        assert not os.path.exists(backup)
+        assert utils.checkpoint_load(backup + utils.EXPORT_CHECKPOINT_SUFFIX)["rows"] == 4
+
+        utils.export_checkpointed(db, backup, resume=True, chunk_size=2)
+        assert len(calls) == 3
+        assert not os.path.exists(backup + utils.EXPORT_CHECKPOINT_SUFFIX)
+
+        rows = utils.json_read(backup)
+        assert [row[0] for row in rows] == list(range(1, 8))
+
+        # Same-length edit of a row already in the .part file
+        calls = interrupt_export(monkeypatch, db, backup, 4)
+        with sqlite3.connect(db) as conn:
+            conn.execute("UPDATE keywords SET keyword = 'zz' WHERE id = 1")
+
+        utils.export_checkpointed(db, backup, resume=True, chunk_size=2)
+        assert len(calls) == 7
+        assert utils.json_read(backup, ["keyword"])[0] == ["zz"]
+
+
+def test_import_resumes_failed_target(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, "source")
+        backup = os.path.join(tmpdir, "engines.json")
+        targets = [os.path.join(tmpdir, "a"), os.path.join(tmpdir, "b")]
+        make_keywords_db(source, 5)
+        for target in targets:
+            make_keywords_db(target, 0)
+        utils.json_write(utils.db_read_keywords(source), backup)
+
+        db_insert_rows = utils.db_insert_rows
+        inserted = []
+
+        def locked_db_insert_rows(database, rows, mode="ignore"):
+            if database == targets[1] and inserted:
+                raise sqlite3.OperationalError("database is locked")
+            if database == targets[1]:
+                inserted.append(len(rows))
+            db_insert_rows(database, rows, mode)
+
+        monkeypatch.setattr(utils, "db_insert_rows", locked_db_insert_rows)
+        failed = utils.import_targets(targets, backup, batch_size=2)
+        assert failed == [targets[1]]
+
+        state = utils.checkpoint_load(backup + utils.IMPORT_CHECKPOINT_SUFFIX)
+        assert state["done"] == [os.path.abspath(targets[0])]
+        assert state["offsets"] == {os.path.abspath(targets[1]): 2}
+        assert state["source_hash"] == utils.file_sha256(backup)
+
+        # An unfinished export of the same backup keeps its checkpoint
+        export_checkpoint = backup + utils.EXPORT_CHECKPOINT_SUFFIX
+        utils.json_save_atomic({"kind": "export", "rows": 4}, export_checkpoint)
+
+        monkeypatch.setattr(utils, "db_insert_rows", db_insert_rows)
+        assert utils.import_targets(targets, backup, resume=True, batch_size=2) == []
+        assert not os.path.exists(backup + utils.IMPORT_CHECKPOINT_SUFFIX)
+        assert utils.checkpoint_load(export_checkpoint)["rows"] == 4
+        for target in targets:
+            with sqlite3.connect(target) as conn:
+                assert conn.execute("SELECT count(*) FROM keywords").fetchone()[0] == 5
+
+
+def test_backup_header_and_projection():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = os.path.join(tmpdir, "Web Data")
+        backup = os.path.join(tmpdir, "engines.json")
+        make_keywords_db(db, 2)
+        with sqlite3.connect(db) as conn:
+            conn.execute("CREATE TABLE meta (key VARCHAR, value VARCHAR)")
+            conn.execute("INSERT INTO meta VALUES ('version', '135')")
+
+        utils.json_write(
+            utils.db_read_keywords(db), backup, utils.db_backup_header(db, "edge")
+        )
+        with open(backup, encoding="utf-8") as file:
+            data = json.load(file)
+        assert data["format"] == utils.BACKUP_FORMAT
+        assert data["version"] == utils.BACKUP_VERSION
+        assert data["browser"] == "edge"
+        assert data["schema_version"] == 135
+        assert data["columns"][27] == {"name": "url_hash", "type": "BLOB"}
+        assert data["rows"][0][27] == "aGFzaA=="
+
+        rows = utils.json_read(backup, ["keyword", "url_hash", "missing"])
+        assert rows == [["e1", b"hash", None], ["e2", b"hash", None]]
+        assert len(utils.json_read(backup)[0]) == 28
+
+        # Bare array backups from before the header
+        with open(backup, "w", encoding="utf-8") as file:
+            json.dump(data["rows"], file)
+        header, _ = utils.backup_load(backup)
+        assert header["version"] == 1
+        assert utils.json_read(backup, ["id", "url_hash"]) == [[1, b"hash"], [2, b"hash"]]
+
+
+def test_parallel_encoding_matches_serial(monkeypatch):
+    rows = [make_keyword_row(i) for i in range(1, 41)]
+    # Duplicate and empty guids across chunk boundaries
+    rows[25] = rows[25][:14] + ('guid-3',) + rows[25][15:]
+    rows[33] = rows[33][:14] + ('',) + rows[33][15:]
+
+    serial_guids = set()
+    serial = utils.encode_rows(rows, serial_guids, chunk_size=40)
+
+    monkeypatch.setattr(utils, "PARALLEL_MIN_ROWS", 0)
+    parallel_guids = set()
+    with utils.encode_pool(len(rows), workers=2) as (pool, workers):
+        assert workers == 2
+        assert pool is not None
+        parallel = utils.encode_rows(rows, parallel_guids, pool, chunk_size=7)
+
+    assert len(parallel) == len(serial) == 40
+    assert len(parallel_guids) == len(serial_guids) == 40
+    for i, (p, s) in enumerate(zip(parallel, serial)):
+        if i in (25, 33):
+            # Regenerated guids are random
+            assert json.loads(p)[14] != json.loads(s)[14]
+        else:
+            assert p == s
+
+
+def test_import_replace_runs_after_ignore():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, "source")
+        target = os.path.join(tmpdir, "target")
+        backup = os.path.join(tmpdir, "engines.json")
+        make_keywords_db(source, 2)
+        make_keywords_db(target, 2)
+        with sqlite3.connect(source) as conn:
+            conn.execute("UPDATE keywords SET url = 'https://new/?q={searchTerms}' WHERE id = 1")
+        utils.json_write(utils.db_read_keywords(source), backup)
+        cache = {}
+
+        assert utils.import_targets([target], backup, "ignore", cache) == []
+        assert utils.get_row_by_id(target, 1)[4] != "https://new/?q={searchTerms}"
+
+        assert utils.import_targets([target], backup, "replace", cache) == []
+        assert utils.get_row_by_id(target, 1)[4] == "https://new/?q={searchTerms}"
+
+
+def test_web_data_paths_include_sibling_profiles(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in ("Default", "Profile 1", "Profile 2"):
+            os.makedirs(os.path.join(tmpdir, profile))
+            open(os.path.join(tmpdir, profile, "Web Data"), "w").close()
+
+        monkeypatch.setattr(
+            locations, "get_browser_path", lambda browser: os.path.join(tmpdir, "Default")
+        )
+        paths = locations.get_web_data_paths("chrome")
+        assert [os.path.basename(os.path.dirname(p)) for p in paths] == [
+            "Default", "Profile 1", "Profile 2"
+        ]
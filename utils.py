@@ -1,8 +1,57 @@
 import sqlite3
 import json
 import base64
+import binascii
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import html
+import os
 
 BACKUP_FILE = "engines.json"
+FINGERPRINT_FILE = ".engines_fingerprints.json"
+EXPORT_CHECKPOINT_SUFFIX = ".export.checkpoint"
+IMPORT_CHECKPOINT_SUFFIX = ".import.checkpoint"
+EXPORT_CHUNK_SIZE = 10000
+IMPORT_BATCH_SIZE = 1000
+ENCODE_CHUNK_SIZE = 5000
+# Below this, starting worker processes costs more than it saves
+PARALLEL_MIN_ROWS = 50000
+BACKUP_FORMAT = "chromium-search-engines"
+BACKUP_VERSION = 2
+
+# Columns of the `keywords` table in Chromium; url_hash is Edge only
+KEYWORD_COLUMNS = [
+    ("id", "INTEGER"),
+    ("short_name", "VARCHAR"),
+    ("keyword", "VARCHAR"),
+    ("favicon_url", "VARCHAR"),
+    ("url", "VARCHAR"),
+    ("safe_for_autoreplace", "INTEGER"),
+    ("originating_url", "VARCHAR"),
+    ("date_created", "INTEGER"),
+    ("usage_count", "INTEGER"),
+    ("input_encodings", "VARCHAR"),
+    ("suggest_url", "VARCHAR"),
+    ("prepopulate_id", "INTEGER"),
+    ("created_by_policy", "INTEGER"),
+    ("last_modified", "INTEGER"),
+    ("sync_guid", "VARCHAR"),
+    ("alternate_urls", "VARCHAR"),
+    ("image_url", "VARCHAR"),
+    ("search_url_post_params", "VARCHAR"),
+    ("suggest_url_post_params", "VARCHAR"),
+    ("image_url_post_params", "VARCHAR"),
+    ("new_tab_url", "VARCHAR"),
+    ("last_visited", "INTEGER"),
+    ("created_from_play_api", "INTEGER"),
+    ("is_active", "INTEGER"),
+    ("starter_pack_id", "INTEGER"),
+    ("enforced_by_policy", "INTEGER"),
+    ("featured_by_policy", "INTEGER"),
+    ("url_hash", "BLOB"),
+]
 
 
 def print_rows(rows):
@@ -19,6 +68,26 @@ def db_read_keywords(database):
         return cursor.fetchall()
 
 
+def db_read_columns(database):
+    """Read the (name, declared type) of each `keywords` column."""
+    with sqlite3.connect(database) as conn:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(keywords);")
+        return [(col[1], col[2]) for col in cursor.fetchall()]
+
+
+def db_schema_version(database):
+    """Read the Web Data schema version from the `meta` table, or None."""
+    try:
+        with sqlite3.connect(database) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM meta WHERE key = 'version'")
+            row = cursor.fetchone()
+    except sqlite3.Error:
+        return None
+    return int(row[0]) if row and str(row[0]).isdigit() else None
+
+
 def db_get_existing_ids(database, ids):
     """Check which ids already exist in the keywords table."""
     if not ids:
@@ -33,51 +102,176 @@ def db_get_existing_ids(database, ids):
         return {row[0] for row in existing}
 
 
-def compare_rows(old_row, new_row):
-    """Compare two rows and return a diff string for key fields in HTML."""
-    key_fields = {
-        1: "Name",
-        2: "Shortcut",
-        3: "Favicon URL",
-        4: "URL",
-        10: "Suggest URL",
-    }
-    diff = []
-    for i, (o, n) in enumerate(zip(old_row, new_row)):
-        if o != n and i in key_fields:
-            # Find common prefix
-            prefix_len = 0
-            min_len = min(len(str(o)), len(str(n)))
-            for j in range(min_len):
-                if str(o)[j] == str(n)[j]:
-                    prefix_len += 1
-                else:
-                    break
-
-            # Find common suffix
-            suffix_len = 0
-            o_str = str(o)
-            n_str = str(n)
-            for j in range(
-                1, min(len(o_str) - prefix_len, len(n_str) - prefix_len) + 1
-            ):
-                if o_str[-j] == n_str[-j]:
-                    suffix_len += 1
-                else:
-                    break
+DIFF_KEY_FIELDS = {
+    1: "Name",
+    2: "Shortcut",
+    3: "Favicon URL",
+    4: "URL",
+    10: "Suggest URL",
+}
+# Fields diffed per URL component
+DIFF_URL_FIELDS = {3, 4, 10}
+DIFF_OLD_STYLE = "background-color:#ff0000;color:black;padding:2px"
+DIFF_NEW_STYLE = "background-color:#0066cc;color:white;padding:2px"
+DIFF_CACHE_SIZE = 4096
 
-            old_diff = o_str[prefix_len : len(o_str) - suffix_len]
-            new_diff = n_str[prefix_len : len(n_str) - suffix_len]
-            prefix = o_str[:prefix_len]
-            suffix = o_str[len(o_str) - suffix_len :] if suffix_len > 0 else ""
 
-            highlighted_old = f"{prefix}<span style='background-color:#ff0000;color:black;padding:2px'>{old_diff}</span>{suffix}"
-            highlighted_new = f"{prefix}<span style='background-color:#0066cc;color:white;padding:2px'>{new_diff}</span>{suffix}"
+def split_url(value):
+    """Split a URL into labelled components that join back into `value`.
+
+    Returns a list of (key, text) pairs. Separators have a None key, query
+    parameters are keyed by name and occurrence so each one is diffed on
+    its own. Templates without a scheme (e.g. `{google:baseURL}search?q=`)
+    are split the same way, leaving scheme and host empty.
+    """
+    parts = []
+    rest = value
+    scheme, sep, after = rest.partition("://")
+    if sep and scheme and "/" not in scheme and "?" not in scheme:
+        parts.append(("scheme", scheme))
+        parts.append((None, sep))
+        host, slash, path = after.partition("/")
+        parts.append(("host", host))
+        rest = slash + path
+
+    rest, hash_sep, fragment = rest.partition("#")
+    path, query_sep, query = rest.partition("?")
+    parts.append(("path", path))
+
+    if query_sep:
+        parts.append((None, query_sep))
+        seen = {}
+        for i, param in enumerate(query.split("&")):
+            if i:
+                parts.append((None, "&"))
+            name = param.partition("=")[0]
+            seen[name] = seen.get(name, 0) + 1
+            parts.append((f"query:{name}:{seen[name]}", param))
+
+    if hash_sep:
+        parts.append((None, hash_sep))
+        parts.append(("fragment", fragment))
+    return parts
+
+
+def _diff_span(old, new):
+    """Return (prefix, suffix) lengths shared by two strings."""
+    prefix_len = len(os.path.commonprefix((old, new)))
+    max_suffix = min(len(old), len(new)) - prefix_len
+    suffix_len = len(os.path.commonprefix((old[::-1], new[::-1])))
+    return prefix_len, min(suffix_len, max_suffix)
+
+
+def _mark(text, other):
+    """Split `text` into (text, changed) pieces against `other`."""
+    if other is None:
+        return [(text, True)]
+    prefix_len, suffix_len = _diff_span(text, other)
+    end = len(text) - suffix_len
+    return [
+        (text[:prefix_len], False),
+        (text[prefix_len:end], True),
+        (text[end:], False),
+    ]
+
+
+def _mark_components(parts, other_parts):
+    """Mark the changed part of each URL component against `other_parts`."""
+    others = {key: text for key, text in other_parts if key is not None}
+    pieces = []
+    for key, text in parts:
+        if key is None:
+            pieces.append((text, False))
+        elif others.get(key) != text:
+            pieces.extend(_mark(text, others.get(key)))
+        else:
+            pieces.append((text, False))
+    return tuple((t, changed) for t, changed in pieces if t)
 
+
+@functools.lru_cache(maxsize=DIFF_CACHE_SIZE)
+def diff_values(old, new, url=False):
+    """Diff two field values.
+
+    With `url`, values are diffed per scheme, host, path, query parameter
+    and fragment; otherwise as a whole. Returns (old_pieces, new_pieces),
+    tuples of (text, changed) that join back into each value. Results are
+    cached by value pair, since the same templates repeat across conflicts.
+    """
+    if not url:
+        return (
+            tuple(piece for piece in _mark(old, new) if piece[0]),
+            tuple(piece for piece in _mark(new, old) if piece[0]),
+        )
+    old_parts = split_url(old)
+    new_parts = split_url(new)
+    return (
+        _mark_components(old_parts, new_parts),
+        _mark_components(new_parts, old_parts),
+    )
+
+
+def render_diff_html(pieces, style):
+    """Render diff pieces as HTML, highlighting changes with `style`."""
+    return "".join(
+        f"<span style='{style}'>{html.escape(text, quote=False)}</span>"
+        if changed
+        else html.escape(text, quote=False)
+        for text, changed in pieces
+    )
+
+
+def render_diff_text(pieces, start, end):
+    """Render diff pieces as plain text, wrapping changes in start/end."""
+    return "".join(
+        f"{start}{text}{end}" if changed else text for text, changed in pieces
+    )
+
+
+def compare_rows(old_row, new_row, text=False):
+    """Compare two rows and return a diff string for key fields.
+
+    Returns HTML by default, or plain text with `[-removed-]` and
+    `{+added+}` markers if `text` is True.
+    """
+    diff = []
+    for i, label in DIFF_KEY_FIELDS.items():
+        if i >= len(old_row) or i >= len(new_row):
+            continue
+        o, n = old_row[i], new_row[i]
+        if o == n:
+            continue
+
+        old_pieces, new_pieces = diff_values(
+            str(o), str(n), i in DIFF_URL_FIELDS
+        )
+        if text:
             diff.append(
-                f"<b>{key_fields[i]}:</b><br>{highlighted_old}<br>{highlighted_new}"
+                f"{label}:\n"
+                f"  - {render_diff_text(old_pieces, '[-', '-]')}\n"
+                f"  + {render_diff_text(new_pieces, '{+', '+}')}"
             )
-    return "<br><br>".join(diff) if diff else "No key changes"
+        else:
+            diff.append(
+                f"<b>{label}:</b><br>"
+                f"{render_diff_html(old_pieces, DIFF_OLD_STYLE)}<br>"
+                f"{render_diff_html(new_pieces, DIFF_NEW_STYLE)}"
+            )
+
+    if not diff:
+        return "No key changes"
+    return "\n\n".join(diff) if text else "<br><br>".join(diff)
+
+
+def compare_conflicts(conflicts, text=False):
+    """Diff every (key, old_row, new_row) conflict up front.
+
+    Returns the diffs in the same order as `conflicts`.
+    """
+    return [
+        compare_rows(old_row, new_row, text)
+        for _key, old_row, new_row in conflicts
+    ]
 
 
 def get_row_by_id(database, row_id):
@@ -193,52 +387,12 @@ def bytes_to_base64(data):
         return data
 
 
-def base64_to_bytes(data):
-    """Convert base64 strings back to bytes objects in nested structures
-
-    keyword rows: converts the url_hash field (index 27)
-    Other string fields are preserved
-    """
-    if isinstance(data, list):
-        # Check if this looks like a list of keyword rows
-        if data and isinstance(data[0], (list, tuple)) and len(data[0]) >= 28:
-            # This is a list of keyword rows
-            result = []
-            for row in data:
-                row_list = list(row)
-                # Only convert url_hash (index 27) from base64 to bytes
-                if len(row_list) >= 28 and isinstance(row_list[27], str):
-                    try:
-                        row_list[27] = base64.b64decode(row_list[27])
-                    except Exception:
-                        # No action on failure
-                        pass
-                result.append(row_list)
-            return result
-        else:
-            # Generic list processing
-            return [base64_to_bytes(item) for item in data]
-    elif isinstance(data, dict):
-        return {key: base64_to_bytes(value) for key, value in data.items()}
-    else:
-        return data
-
-
-def validate_row_for_export(row, seen_guids=None):
-    """Validate a keyword row for export to JSON.
-
-    Ensures the exported data is valid for all Chromium browsers:
-    - Validates critical fields (short_name, keyword, url)
-    - Ensures sync_guid is unique
-    - Converts None to appropriate defaults per field type
-    - Ensures url contains {searchTerms}
+def validate_row_fields(row):
+    """Validate the critical fields of a keyword row and fill in defaults.
 
-    Args:
-        row: Tuple/list representing a keywords table row
-        seen_guids: Set of sync_guids already processed (duplicates)
+    The checks of `validate_row_for_export` that only depend on the row
+    itself; sync_guid uniqueness is not checked. Returns a list.
     """
-    import uuid
-
     row_list = list(row)
 
     # 1. VALIDATE critical fields
@@ -260,6 +414,45 @@ def validate_row_for_export(row, seen_guids=None):
             f"Row has invalid URL (missing {{searchTerms}}) for engine: {row_list[1]}"
         )
 
+    # Convert fields according to keywords table defaults
+    default_fields = {
+        7: 0,   # date_created
+        8: 0,   # usage_count
+        11: 0,  # prepopulate_id
+        12: 0,  # created_by_policy
+        13: 0,  # last_modified
+        21: 0,  # last_visited
+        22: 0,  # created_from_play_api
+        23: 0,  # is_active
+        24: 0,  # starter_pack_id
+        25: 0,  # enforced_by_policy
+        26: 0,  # featured_by_policy
+    }
+
+    for idx, default_val in default_fields.items():
+        if idx < len(row_list) and row_list[idx] is None:
+            row_list[idx] = default_val
+
+    return row_list
+
+
+def validate_row_for_export(row, seen_guids=None):
+    """Validate a keyword row for export to JSON.
+
+    Ensures the exported data is valid for all Chromium browsers:
+    - Validates critical fields (short_name, keyword, url)
+    - Ensures sync_guid is unique
+    - Converts None to appropriate defaults per field type
+    - Ensures url contains {searchTerms}
+
+    Args:
+        row: Tuple/list representing a keywords table row
+        seen_guids: Set of sync_guids already processed (duplicates)
+    """
+    import uuid
+
+    row_list = validate_row_fields(row)
+
     # 2. NORMALIZE sync_guid (idx 14)
     if seen_guids is None:
         seen_guids = set()
@@ -282,59 +475,234 @@ def validate_row_for_export(row, seen_guids=None):
 
         seen_guids.add(row_list[14])
 
-    # Convert fields according to keywords table defaults
-    default_fields = {
-        7: 0,   # date_created
-        8: 0,   # usage_count
-        11: 0,  # prepopulate_id
-        12: 0,  # created_by_policy
-        13: 0,  # last_modified
-        21: 0,  # last_visited
-        22: 0,  # created_from_play_api
-        23: 0,  # is_active
-        24: 0,  # starter_pack_id
-        25: 0,  # enforced_by_policy
-        26: 0,  # featured_by_policy
+    return tuple(row_list)
+
+
+def backup_header(columns, browser=None, schema_version=None):
+    """Build the header of a backup.
+
+    `columns` is a list of (name, declared type), as `db_read_columns`.
+    """
+    return {
+        "format": BACKUP_FORMAT,
+        "version": BACKUP_VERSION,
+        "browser": browser,
+        "schema_version": schema_version,
+        "columns": [{"name": name, "type": type_} for name, type_ in columns],
     }
 
-    for idx, default_val in default_fields.items():
-        if idx < len(row_list) and row_list[idx] is None:
-            row_list[idx] = default_val
 
-    return tuple(row_list)
+def db_backup_header(database, browser=None):
+    """Build the header of a backup of `database`."""
+    return backup_header(
+        db_read_columns(database), browser, db_schema_version(database)
+    )
 
 
-def json_write(rows, f=BACKUP_FILE):
-    """Write rows to a JSON backup file with validation and normalization."""
-    # Normalize and validate all rows before export
-    seen_guids = set()
-    normalized_rows = []
+ROW_ITEM_SEPARATOR = ",\n      "
+
+
+def encode_row(row):
+    """Encode a validated row as it appears in the JSON backup file.
+
+    Rows are flat, so the values are encoded in one call without `indent`
+    (which makes `json` fall back to its pure Python encoder) and the
+    indentation comes from the item separator.
+    """
+    if not row:
+        return "    []"
+    values = [
+        base64.b64encode(v).decode("utf-8") if isinstance(v, bytes) else v
+        for v in row
+    ]
+    text = json.dumps(values, separators=(ROW_ITEM_SEPARATOR, ": "))
+    return f"    [\n      {text[1:-1]}\n    ]"
+
+
+def backup_write_start(file, header):
+    """Write the header of a backup opened in binary mode."""
+    text = json.dumps({**header, "rows": []}, indent=2)
+    file.write(text[: text.rindex("]")].encode("utf-8"))
+
+
+def backup_write_rows(file, encoded_rows, count=0):
+    """Append encoded rows to a backup opened in binary mode.
+
+    `count` is the number of rows already written. Returns the new count.
+    """
+    if not encoded_rows:
+        return count
+    # One write per call; the separator before the first row depends on count
+    text = ",\n".join(encoded_rows)
+    file.write(((",\n" if count else "\n") + text).encode("utf-8"))
+    return count + len(encoded_rows)
 
-    for i, row in enumerate(rows):
+
+def backup_write_end(file, count):
+    """Close a backup with `count` rows."""
+    file.write(b"\n  ]\n}" if count else b"]\n}")
+
+
+def _encode_chunk(chunk):
+    """Validate and encode a (start index, rows) chunk, in a worker process.
+
+    Returns (encoded row, sync_guid) for each row; guid uniqueness is left
+    to `encode_rows`, which sees every chunk.
+    """
+    start, rows = chunk
+    result = []
+    for i, row in enumerate(rows, start):
         try:
-            validated = validate_row_for_export(row, seen_guids)
-            normalized_rows.append(validated)
+            validated = validate_row_fields(row)
         except ValueError as e:
             # Log error with context
             print(f"Error validating row {i}: {e}")
             raise
+        guid = validated[14] if len(validated) > 14 else None
+        result.append((encode_row(validated), guid))
+    return result
+
+
+def encode_rows(
+    rows, seen_guids, pool=None, start=0, chunk_size=ENCODE_CHUNK_SIZE
+):
+    """Validate and encode rows for a backup, in order.
+
+    Chunks are validated and encoded on the process `pool` if given. The
+    sync_guid of every row is then checked against `seen_guids` in row
+    order, and rows with an empty or duplicate guid are normalized again by
+    `validate_row_for_export`, so the output is the same as a serial run.
+    `start` is the index of the first row, for error messages.
+    """
+    chunks = [
+        (start + i, rows[i : i + chunk_size])
+        for i in range(0, len(rows), chunk_size)
+    ]
+    mapper = pool.map if pool else map
+
+    encoded_rows = []
+    for (_start, chunk), results in zip(chunks, mapper(_encode_chunk, chunks)):
+        for row, (text, guid) in zip(chunk, results):
+            if len(row) > 14:
+                if not guid or guid in seen_guids:
+                    validated = validate_row_for_export(row, seen_guids)
+                    text = encode_row(validated)
+                else:
+                    seen_guids.add(guid)
+            encoded_rows.append(text)
+    return encoded_rows
+
+
+@contextlib.contextmanager
+def encode_pool(row_count, workers=1):
+    """Yield (pool, workers) for `encode_rows`, pool None to encode serially.
+
+    `workers` 0 means one per CPU. Small exports always run serially and
+    yield a worker count of 1. Worker processes may re-import the caller's
+    script, so only scripts with a `__main__` guard should ask for more.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers < 2 or row_count < PARALLEL_MIN_ROWS:
+        yield None, 1
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        yield pool, workers
 
-    # Convert any bytes objects to base64 strings
-    serializable_rows = bytes_to_base64(normalized_rows)
 
-    with open(f, "w", encoding="utf-8") as file:
-        json.dump(serializable_rows, file, indent=2)
+def json_write(rows, f=BACKUP_FILE, header=None, workers=1):
+    """Write rows to a JSON backup file with validation and normalization.
+
+    `header` describes the columns of `rows`, see `db_backup_header`. By
+    default the rows are taken to follow the Chromium `keywords` columns.
+    Large exports can be validated and encoded on `workers` processes,
+    see `encode_pool`.
+    """
+    rows = list(rows)
+
+    # Normalize and validate all rows before export
+    with encode_pool(len(rows), workers) as (pool, _workers):
+        encoded_rows = encode_rows(rows, set(), pool)
+
+    if header is None:
+        width = max((len(row) for row in rows), default=0)
+        header = backup_header(KEYWORD_COLUMNS[:width])
+
+    with open(f, "wb") as file:
+        backup_write_start(file, header)
+        count = backup_write_rows(file, encoded_rows)
+        backup_write_end(file, count)
 
     # Log summary
-    print(f"Successfully exported {len(normalized_rows)} search engines to {f}")
+    print(f"Successfully exported {count} search engines to {f}")
+
 
+def backup_load(f=BACKUP_FILE):
+    """Read the header and the raw, undecoded rows of a backup.
 
-def json_read(f=BACKUP_FILE):
-    """Read rows from a JSON backup file."""
+    Backups from before the header (a bare array of rows) get a header
+    with the Chromium `keywords` columns and version 1.
+    """
     with open(f, "r", encoding="utf-8") as file:
-        rows = json.load(file)
-        rows = base64_to_bytes(rows)
-        return rows
+        data = json.load(file)
+
+    if isinstance(data, list):
+        width = max((len(row) for row in data), default=0)
+        header = backup_header(KEYWORD_COLUMNS[:width])
+        header["version"] = 1
+        return header, data
+
+    if not isinstance(data, dict) or data.get("format") != BACKUP_FORMAT:
+        raise ValueError(f"{f} is not a search engines backup")
+    if data.get("version", 0) > BACKUP_VERSION:
+        raise ValueError(
+            f"{f} has backup version {data['version']}, "
+            f"newest supported is {BACKUP_VERSION}"
+        )
+    rows = data.pop("rows", [])
+    return data, rows
+
+
+def backup_project(header, rows, columns=None):
+    """Decode `rows` keeping only `columns`, in that order.
+
+    Columns missing from the backup are None. Values of BLOB columns are
+    decoded from base64; nothing else is touched.
+    """
+    names = [col["name"] for col in header["columns"]]
+    if columns is None:
+        columns = names
+    positions = {name: i for i, name in enumerate(names)}
+    indices = [positions.get(name) for name in columns]
+    blobs = {
+        i
+        for i, col in enumerate(header["columns"])
+        if col["type"].upper() == "BLOB"
+    }
+
+    result = []
+    for row in rows:
+        projected = []
+        for i in indices:
+            value = row[i] if i is not None and i < len(row) else None
+            if i in blobs and isinstance(value, str):
+                try:
+                    value = base64.b64decode(value)
+                except binascii.Error:
+                    # No action on failure
+                    pass
+            projected.append(value)
+        result.append(projected)
+    return result
+
+
+def json_read(f=BACKUP_FILE, columns=None):
+    """Read rows from a JSON backup file.
+
+    `columns` selects and orders the columns to decode, e.g. the column
+    names of the target database. All columns are returned by default.
+    """
+    header, rows = backup_load(f)
+    return backup_project(header, rows, columns)
 
 
 def compare_data(rows1, rows2):
@@ -358,12 +726,15 @@ def compare_data(rows1, rows2):
     return True, "The arrays are equal."
 
 
-def handle_import_conflicts(file_path, filas):
+def handle_import_conflicts(file_path, filas, existing_shortcuts=None):
     """Prepare data for import and identify conflicts and new entries.
 
+    existing_shortcuts: shortcuts already in the database, read if not given.
+
     Returns: (to_insert, conflicts) where conflicts is list of (key, old_row, new_row)
     """
-    existing_shortcuts = get_existing_shortcuts(file_path)
+    if existing_shortcuts is None:
+        existing_shortcuts = get_existing_shortcuts(file_path)
 
     conflicts = []
     to_insert = []
@@ -386,7 +757,7 @@ def handle_import_conflicts(file_path, filas):
         # Check shortcut conflict
         if shortcut and shortcut in existing_shortcuts:
             old_row = get_row_by_shortcut(file_path, shortcut)
-            if has_key_changes(old_row, row):
+            if old_row is not None and has_key_changes(old_row, row):
                 conflicts.append((f"Shortcut: {shortcut}", old_row, row))
                 conflict_found = True
 
@@ -396,6 +767,381 @@ def handle_import_conflicts(file_path, filas):
     return to_insert, conflicts
 
 
+def file_stat(path):
+    """Return [dev, inode, size, mtime_ns] of `path`, or None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def db_stat(database):
+    """Return the file identity of a database, including its WAL file."""
+    return [file_stat(database), file_stat(database + "-wal")]
+
+
+def db_keywords_checksum(database):
+    """Return a SHA-256 of the content of the `keywords` table.
+
+    Only computed when the file identity changed, so it can afford to read
+    every row; edits do not reliably bump `last_modified`.
+    """
+    digest = hashlib.sha256()
+    with sqlite3.connect(database) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM keywords ORDER BY rowid")
+        for rows in iter(lambda: cursor.fetchmany(EXPORT_CHUNK_SIZE), []):
+            digest.update(repr(rows).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fingerprint_load(f=FINGERPRINT_FILE):
+    """Read the fingerprint cache, or an empty one if missing or invalid."""
+    try:
+        with open(f, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def json_save_atomic(data, f):
+    """Write `data` as JSON to `f` atomically."""
+    tmp = f"{f}.tmp"
+    with open(tmp, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+    os.replace(tmp, f)
+
+
+def fingerprint_save(cache, f=FINGERPRINT_FILE):
+    """Write the fingerprint cache atomically."""
+    json_save_atomic(cache, f)
+
+
+def fingerprint_unchanged(cache, key, database, others=()):
+    """Check `database` and the `others` files against a cache entry.
+
+    File identity is compared first; the `keywords` checksum is only
+    computed when the file was touched (Chromium writes other tables of
+    `Web Data` too). A matching checksum refreshes the stored identity.
+    """
+    entry = cache.get(key)
+    if not entry:
+        return False
+    if entry.get("others") != [file_stat(path) for path in others]:
+        return False
+
+    stat = db_stat(database)
+    if entry.get("stat") == stat:
+        return True
+    if entry.get("checksum") != db_keywords_checksum(database):
+        return False
+    entry["stat"] = stat
+    return True
+
+
+def fingerprint_store(
+    cache, key, database, others=(), stat=None, checksum=None
+):
+    """Record the fingerprint of `database` and `others`.
+
+    `stat` and `checksum` default to the current ones. Pass the values
+    taken before reading the rows, so a write in between is seen as a
+    change on the next run.
+    """
+    cache[key] = {
+        "stat": db_stat(database) if stat is None else stat,
+        "checksum": (
+            db_keywords_checksum(database) if checksum is None else checksum
+        ),
+        "others": [file_stat(path) for path in others],
+    }
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checkpoint_load(f):
+    """Read a checkpoint, or None if there is none."""
+    try:
+        with open(f, "r", encoding="utf-8") as file:
+            state = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def checkpoint_remove(f, kind):
+    """Remove a checkpoint of `kind` once its run has finished."""
+    state = checkpoint_load(f)
+    if state is not None and state.get("kind") == kind:
+        os.remove(f)
+
+
+def export_checkpointed(
+    database,
+    f=BACKUP_FILE,
+    resume=False,
+    chunk_size=EXPORT_CHUNK_SIZE,
+    browser=None,
+    workers=1,
+):
+    """Export `database` to `f` in chunks, checkpointing after each one.
+
+    Rows are streamed into `f.part` in rowid order. The checkpoint records
+    the last rowid, the row count, the bytes written and the `keywords`
+    checksum. With `resume`, a run continues from the checkpoint if the
+    table is unchanged; otherwise the export starts over.
+
+    Large exports can be validated and encoded on `workers` processes, see
+    `encode_pool`, one chunk per worker between checkpoints.
+
+    Returns the `keywords` checksum the export was checked against.
+    """
+    checkpoint = f + EXPORT_CHECKPOINT_SUFFIX
+    part = f + ".part"
+    source = os.path.abspath(database)
+    checksum = db_keywords_checksum(database)
+
+    state = checkpoint_load(checkpoint) if resume else None
+    if (
+        not state
+        or state.get("kind") != "export"
+        or state.get("source") != source
+        or state.get("checksum") != checksum
+        or not os.path.exists(part)
+        or os.path.getsize(part) < state.get("bytes", 0)
+    ):
+        state = {
+            "kind": "export",
+            "source": source,
+            "checksum": checksum,
+            "rowid": None,
+            "rows": 0,
+            "bytes": 0,
+        }
+    elif state["rows"]:
+        print(f"Resuming export of {database} at row {state['rows']}")
+
+    with sqlite3.connect(database) as conn:
+        cursor = conn.cursor()
+        seen_guids = set()
+        if state["rowid"] is None:
+            cursor.execute("SELECT count(*) FROM keywords")
+            remaining = cursor.fetchone()[0]
+            cursor.execute("SELECT rowid, * FROM keywords ORDER BY rowid")
+        else:
+            cursor.execute(
+                "SELECT count(*) FROM keywords WHERE rowid > ?",
+                (state["rowid"],),
+            )
+            remaining = cursor.fetchone()[0]
+            # Duplicates are decided on the original guids; regenerated
+            # ones are random and never clash with later rows
+            cursor.execute(
+                "SELECT sync_guid FROM keywords WHERE rowid <= ?",
+                (state["rowid"],),
+            )
+            seen_guids.update(row[0] for row in cursor.fetchall() if row[0])
+            cursor.execute(
+                "SELECT rowid, * FROM keywords WHERE rowid > ? ORDER BY rowid",
+                (state["rowid"],),
+            )
+
+        with encode_pool(remaining, workers) as (pool, workers):
+            with open(part, "r+b" if state["bytes"] else "wb") as file:
+                if state["bytes"]:
+                    file.seek(state["bytes"])
+                    file.truncate()
+                else:
+                    header = db_backup_header(database, browser)
+                    backup_write_start(file, header)
+
+                count = state["rows"]
+                round_size = chunk_size * workers
+                while True:
+                    chunk = cursor.fetchmany(round_size)
+                    if not chunk:
+                        break
+                    rows = [row[1:] for row in chunk]
+                    encoded_rows = encode_rows(
+                        rows, seen_guids, pool, count, chunk_size
+                    )
+                    count = backup_write_rows(file, encoded_rows, count)
+                    file.flush()
+
+                    state["rowid"] = chunk[-1][0]
+                    state["rows"] = count
+                    state["bytes"] = file.tell()
+                    json_save_atomic(state, checkpoint)
+
+                backup_write_end(file, count)
+
+    os.replace(part, f)
+    checkpoint_remove(checkpoint, "export")
+    print(f"Successfully exported {count} search engines to {f}")
+    return checksum
+
+
+def export_if_changed(
+    database,
+    f=BACKUP_FILE,
+    cache=None,
+    force=False,
+    resume=False,
+    browser=None,
+    workers=1,
+):
+    """Export `database` to `f` unless it is unchanged since the last export.
+
+    `cache` is a fingerprint cache from `fingerprint_load`; the caller
+    saves it. An unfinished export is resumed if `resume` is set.
+    Returns True if the backup was written.
+    """
+    if cache is None:
+        cache = {}
+    key = f"export:{os.path.abspath(database)}:{os.path.abspath(f)}"
+    partial = resume and os.path.exists(f + EXPORT_CHECKPOINT_SUFFIX)
+    if (
+        not force
+        and not partial
+        and fingerprint_unchanged(cache, key, database, [f])
+    ):
+        return False
+
+    stat = db_stat(database)
+    checksum = export_checkpointed(
+        database, f, resume, browser=browser, workers=workers
+    )
+    fingerprint_store(cache, key, database, [f], stat, checksum)
+    return True
+
+
+def db_merge_rows(
+    database,
+    rows,
+    mode="ignore",
+    offset=0,
+    batch_size=IMPORT_BATCH_SIZE,
+    progress=None,
+):
+    """Merge rows[offset:] into `database` in committed batches.
+
+    Conflicting shortcuts keep the existing row, or are replaced if `mode`
+    is 'replace'. `progress` is called with the number of rows merged after
+    each batch. A batch redone after a crash is only inserted once, since
+    its rows then exist without key changes and are inserted with IGNORE.
+    """
+    # Read once per target; each merged batch adds its own shortcuts
+    existing_shortcuts = get_existing_shortcuts(database)
+    for start in range(offset, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        to_insert, conflicts = handle_import_conflicts(
+            database, batch, existing_shortcuts
+        )
+        if to_insert:
+            db_insert_rows(database, to_insert, "ignore")
+        if conflicts and mode == "replace":
+            db_insert_rows(database, [row for _, _, row in conflicts], "replace")
+        existing_shortcuts.update(row[2] for row in batch if row[2])
+        if progress:
+            progress(start + len(batch))
+
+
+def import_targets(
+    targets,
+    f=BACKUP_FILE,
+    mode="ignore",
+    cache=None,
+    force=False,
+    resume=False,
+    batch_size=IMPORT_BATCH_SIZE,
+):
+    """Merge the backup `f` into every target database.
+
+    Progress is checkpointed in `f.import.checkpoint`: targets done, the row offset
+    of unfinished targets and the SHA-256 of the backup. With `resume`, a
+    run skips finished targets and continues the others from their offset,
+    as long as the backup is unchanged. Targets that are locked or fail are
+    left in the checkpoint and the run moves on.
+
+    `cache` is a fingerprint cache from `fingerprint_load`; the caller
+    saves it. Returns the list of targets that failed.
+    """
+    if cache is None:
+        cache = {}
+    checkpoint = f + IMPORT_CHECKPOINT_SUFFIX
+    if not os.path.isfile(f):
+        print(f"Error importing: backup {f} not found")
+        return list(targets)
+
+    state = checkpoint_load(checkpoint) if resume else None
+    if state and (
+        state.get("kind") != "import"
+        or state.get("source_hash") != file_sha256(f)
+    ):
+        print(f"{f} changed since the checkpoint, starting over")
+        state = None
+    if state is None:
+        state = {"kind": "import", "source_hash": None, "done": [], "offsets": {}}
+
+    backup = None
+    failed = []
+    for target in targets:
+        target_path = os.path.abspath(target)
+        if target_path in state["done"]:
+            print(f"Already imported, skipped {target}")
+            continue
+
+        offset = state["offsets"].get(target_path, 0)
+        key = f"import:{mode}:{target_path}:{os.path.abspath(f)}"
+        if (
+            not force
+            and not offset
+            and fingerprint_unchanged(cache, key, target, [f])
+        ):
+            print(f"Unchanged, skipped {target}")
+            continue
+
+        if backup is None:
+            state["source_hash"] = state["source_hash"] or file_sha256(f)
+            backup = backup_load(f)
+        if offset:
+            print(f"Resuming import into {target} at row {offset}")
+
+        def progress(merged, target_path=target_path):
+            state["offsets"][target_path] = merged
+            json_save_atomic(state, checkpoint)
+
+        try:
+            columns = [name for name, _type in db_read_columns(target)]
+            rows = backup_project(*backup, columns)
+            db_merge_rows(target, rows, mode, offset, batch_size, progress)
+        except sqlite3.Error as e:
+            print(f"Error importing into {target}: {e}")
+            failed.append(target)
+            continue
+
+        fingerprint_store(cache, key, target, [f])
+        state["done"].append(target_path)
+        state["offsets"].pop(target_path, None)
+        json_save_atomic(state, checkpoint)
+        print(f"Search Engines imported successfully in {target}")
+
+    if failed:
+        print(f"{len(failed)} target(s) failed, run again with --resume")
+    else:
+        checkpoint_remove(checkpoint, "import")
+    return failed
+
+
 def add_spaces(lista, spaces=5):
     """Append `spaces` number of spaces to each string in `lista`."""
     return [item + " " * spaces for item in lista]